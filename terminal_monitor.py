@@ -7,13 +7,19 @@ This script monitors command outputs for errors and offers fixes automatically.
 import os
 import sys
 import re
-import subprocess
-import tempfile
+import socket
+import string
 import asyncio
+import bisect
 import random
+import time
 import hashlib
+import hmac
+import secrets
 import argparse
+import functools
 import json
+import locale
 from datetime import datetime
 from typing import Dict, Any
 from pathlib import Path
@@ -21,6 +27,8 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Confirm, Prompt
 from rich.markdown import Markdown
+from rich.live import Live
+from rich.text import Text
 import msvcrt
 
 try:
@@ -34,8 +42,25 @@ except ImportError:
     # dotenv not installed, continue without it
     pass
 
+try:
+    import orjson
+except ImportError:
+    # orjson not installed, fall back to the standard json module
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy not installed, semantic response caching is disabled
+    np = None
+
 # Setup Rich console
-console = Console()
+console = Console(highlight=False, emoji=False, markup=True)
+
+@functools.lru_cache(maxsize=128)
+def render_markdown(text):
+    """Parse Markdown once per distinct text."""
+    return Markdown(text)
 
 # Witty welcome messages
 WELCOME_MESSAGES = [
@@ -46,14 +71,129 @@ WELCOME_MESSAGES = [
     "TheWatcher is on duty. No error shall pass unnoticed!",
 ]
 
-# Import needed AI libraries
-try:
-    import openai
-    import google.generativeai as genai
-    import groq
-except ImportError:
-    console.print("[bold red]Required AI libraries not installed. Please install them with: pip install -r requirements.txt[/]")
-    sys.exit(1)
+# Model used by each AI provider
+AI_MODELS = {
+    "OpenAI": "gpt-3.5-turbo",
+    "Google Gemini": "gemini-pro",
+    "Groq": "mixtral-8x7b-32768",
+}
+
+# Output patterns that indicate an error
+ERROR_PATTERNS = (
+    r"Traceback \(most recent call last\)",  # Python
+    # Generic errors, incl. JavaScript SyntaxError/ReferenceError/TypeError; the lookbehind
+    # starts each attempt at a word start, keeping long runs of letters linear to scan
+    r"(?<![A-Za-z])[A-Za-z]+Error:",
+    r"Exception in thread",  # Java
+    r"Caused by:",  # Java
+    r"npm ERR!",  # npm
+)
+# Matched against raw output bytes, so it is compiled from the encoded patterns
+ERROR_RE = re.compile("|".join(ERROR_PATTERNS).encode("ascii"))
+# Same patterns for decoded text, used to find where the error starts
+ERROR_TEXT_RE = re.compile("|".join(ERROR_PATTERNS))
+
+# Bytes of output kept before (and after) the first detected error
+OUTPUT_BUFFER_LIMIT = 64 * 1024
+
+# Output is read in chunks; the error scan re-reads at most this much of an unfinished line
+OUTPUT_CHUNK_SIZE = 64 * 1024
+ERROR_SCAN_OVERLAP = 256
+
+# Longest single JSON message exchanged with the daemon
+DAEMON_MESSAGE_LIMIT = 1024 * 1024
+
+# Error message extraction used by parse_error
+ERROR_MESSAGE_RE = re.compile(r'(?<![A-Za-z])([A-Za-z]+Error:[^\n]*)')
+
+# Prompt sent to the AI provider for each error
+PROMPT_TEMPLATE = (
+    "You are a programming assistant. Help debug the following error:\n\n"
+    "Error message: {error_message}\n\n"
+    "Full error:\n{raw_error}\n\n"
+    "Please provide:\n"
+    "1. A brief explanation of what caused the error\n"
+    "2. A solution to fix the error\n"
+)
+
+# On-disk cache of AI responses, keyed by a hash of the error
+CACHE_DIR = Path.home() / ".cache" / "thewatcher"
+CACHE_MAX_ENTRIES = 1000
+CACHE_ENABLED = os.getenv("THEWATCHER_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Semantic cache: reuse an answer when a new error's embedding is close to a past one
+SEMANTIC_CACHE_PATH = Path.home() / ".thewatcher" / "semantic_cache.json"
+SEMANTIC_VECTORS_PATH = Path.home() / ".thewatcher" / "semantic_cache.npy"
+SEMANTIC_CACHE_THRESHOLD = 0.95
+# Answers borrowed from a similar (not identical) error are shown with reduced confidence
+SEMANTIC_MATCH_CONFIDENCE = 0.7
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_MAX_CHARS = 8000
+
+# Local analysis daemon shared by TheWatcher runs (TCP, as Windows lacks Unix sockets).
+# Runs only look for it when THEWATCHER_DAEMON is set. Both sides prove knowledge of a
+# secret token, kept in a user-only file, before any command output is exchanged.
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = int(os.getenv("THEWATCHER_DAEMON_PORT", "47474"))
+DAEMON_ENABLED = os.getenv("THEWATCHER_DAEMON", "").lower() in ("1", "true", "yes")
+DAEMON_TOKEN_PATH = Path.home() / ".thewatcher" / "daemon.token"
+
+# Confidence display colors: above 0.7 is green, above 0.4 yellow, else red
+CONFIDENCE_THRESHOLDS = (0.4, 0.7)
+CONFIDENCE_COLORS = ("red", "yellow", "green")
+
+# Canned analyses used when the AI provider is unavailable, keyed by error class.
+# They are displayed as plain text, so they must not contain Markdown.
+FALLBACK_RESPONSES = {
+    "ZeroDivisionError": {
+        "error": "ZeroDivisionError",
+        "explanation": "This error occurs when you attempt to divide by zero, which is mathematically undefined.",
+        "solution": "Add a check to ensure the denominator is not zero before performing division. Example: 'if b != 0: result = a / b else: handle_zero_case()'",
+        "confidence": 0.95
+    },
+    "IndexError": {
+        "error": "IndexError",
+        "explanation": "This error occurs when you try to access an index that is outside the bounds of a list or sequence.",
+        "solution": "Check that your index is within the valid range (0 to len(sequence)-1) before accessing it. Consider using a try/except block or a conditional check.",
+        "confidence": 0.95
+    },
+    "KeyError": {
+        "error": "KeyError",
+        "explanation": "This error occurs when you try to access a dictionary key that doesn't exist.",
+        "solution": "Use dict.get(key) which returns None for missing keys, or check if the key exists with 'if key in dict' before accessing it.",
+        "confidence": 0.95
+    },
+    "NameError": {
+        "error": "NameError",
+        "explanation": "This error occurs when you try to use a variable or function that hasn't been defined.",
+        "solution": "Make sure the variable is defined before using it. Check for typos in variable names. Ensure the variable is defined in the current scope.",
+        "confidence": 0.95
+    },
+}
+
+# TypeError analyses, matched on a fragment of the error message
+TYPE_ERROR_FALLBACKS = {
+    "can only concatenate str (not \"int\") to str": {
+        "error": "TypeError: can only concatenate str (not \"int\") to str",
+        "explanation": "This error occurs when you try to add (concatenate) a string and an integer directly in Python. Python cannot automatically convert between these types.",
+        "solution": "Convert the integer to a string using the str() function before concatenation. For example: 'text + str(num)' instead of 'text + num'.",
+        "confidence": 0.95
+    },
+    "is not a function": {
+        "error": "TypeError: x is not a function",
+        "explanation": "This JavaScript error occurs when you try to call something that is not a function as if it were a function.",
+        "solution": "Check the type of the object before calling it. Make sure you're not using a property when you meant to use a method.",
+        "confidence": 0.95
+    },
+}
+
+DEFAULT_FALLBACK_RESPONSE = {
+    "explanation": "This error typically occurs due to a mismatch between what the code is expecting and what it's actually receiving.",
+    "solution": "Check the values being used at the point of the error. Ensure types match what the operation requires. Consider adding more validation or error handling.",
+    "confidence": 0.6
+}
+
+ERROR_CLASS_RE = re.compile(r'([A-Za-z]+Error)\b')
 
 def get_api_key(prompt):
     """Get API key with support for pasting."""
@@ -78,12 +218,90 @@ def get_api_key(prompt):
     
     return api_key.strip()
 
+def load_daemon_token():
+    """Return the running daemon's secret token, or None if there is none."""
+    try:
+        return DAEMON_TOKEN_PATH.read_text(encoding="ascii").strip() or None
+    except (OSError, ValueError):
+        return None
+
+def save_daemon_token(token):
+    """Write the daemon's secret token to a file only the current user can read."""
+    DAEMON_TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Recreate the file so an existing one cannot keep looser permissions
+    DAEMON_TOKEN_PATH.unlink(missing_ok=True)
+    fd = os.open(DAEMON_TOKEN_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(token)
+
+def daemon_proof(token, role, nonce):
+    """Prove knowledge of the daemon token for a role ("daemon" or "client") and nonce."""
+    return hmac.new(token.encode("ascii"), f"{role}:{nonce}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+def daemon_available():
+    """Check whether a TheWatcher daemon is accepting connections."""
+    try:
+        with socket.create_connection((DAEMON_HOST, DAEMON_PORT), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+def json_loads(data):
+    """Parse JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj):
+    """Serialize an object to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+@functools.lru_cache(maxsize=4)
+def load_config_file(path, mtime):
+    """Parse a JSON config file, cached per path and modification time."""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+def find_error_message(text):
+    """Return the first "SomethingError: ..." line fragment in text, or ""."""
+    for line in text.splitlines():
+        index = line.find("Error:")
+        while index != -1:
+            start = index
+            while start > 0 and line[start - 1] in string.ascii_letters:
+                start -= 1
+            if start < index:
+                return line[start:].strip()
+            index = line.find("Error:", index + 1)
+    return ""
+
 class TerminalMonitor:
     """Monitors terminal commands and analyzes errors."""
     
-    def __init__(self):
+    # Supported AI providers and the environment variable holding each API key
+    PROVIDERS = (
+        ("OpenAI", "OPENAI_API_KEY"),
+        ("Google Gemini", "GOOGLE_API_KEY"),
+        ("Groq", "GROQ_API_KEY"),
+    )
+    PROVIDER_ENV_VARS = dict(PROVIDERS)
+    PROVIDER_CHOICES = {str(number): name for number, (name, _) in enumerate(PROVIDERS, 1)}
+    
+    def __init__(self, connect_to_daemon=True):
         """Initialize the terminal monitor."""
-        self.setup_ai_provider()
+        # A running daemon already has a provider set up, so hand analyses to it
+        # (only when opted in, so normal runs never pay for the connection probe)
+        self.daemon_token = load_daemon_token() if connect_to_daemon and DAEMON_ENABLED else None
+        self.use_daemon = self.daemon_token is not None and daemon_available()
+        if not self.use_daemon:
+            self.setup_ai_provider()
+        
+        # Responses already seen in this session, and the semantic cache (loaded on first use)
+        self.response_memo = {}
+        self.semantic_vectors = None
+        self.semantic_results = None
         
         # Welcome message
         welcome_msg = random.choice(WELCOME_MESSAGES)
@@ -92,13 +310,12 @@ class TerminalMonitor:
     def load_config(self):
         """Load configuration from config file."""
         config_path = Path.home() / ".thewatcher" / "config.json"
-        if config_path.exists():
-            try:
-                with open(config_path, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return {}
+        try:
+            mtime = os.stat(config_path).st_mtime
+            return dict(load_config_file(str(config_path), mtime))
+        except (OSError, ValueError):
+            # Missing, unreadable or malformed config
+            return {}
     
     def save_config(self, provider, api_key):
         """Save configuration to file."""
@@ -111,46 +328,37 @@ class TerminalMonitor:
             "api_key": api_key
         }
         
-        with open(config_path, 'w') as f:
-            json.dump(config, f)
+        with open(config_path, 'wb') as f:
+            f.write(json_dumps(config))
     
     def setup_ai_provider(self):
         """Set up the AI provider and get API key."""
-        providers = {
-            "1": ("OpenAI", "OPENAI_API_KEY"),
-            "2": ("Google Gemini", "GOOGLE_API_KEY"),
-            "3": ("Groq", "GROQ_API_KEY")
-        }
-        
         # Try to load from config
         config = self.load_config()
-        if config.get("provider") and config.get("api_key"):
+        if config.get("provider") in self.PROVIDER_ENV_VARS and config.get("api_key"):
             # Ask if user wants to use saved settings
             if Confirm.ask(f"\nFound saved settings for {config['provider']}. Use these settings?"):
                 self.provider = config["provider"]
                 self.api_key = config["api_key"]
-                self.initialize_provider(self.provider, self.api_key)
                 return
         
         # If no saved settings or user chose not to use them, get new settings
         # Display provider options
         console.print("\n[bold cyan]Select your AI provider:[/]")
-        for key, (name, _) in providers.items():
+        for key, name in self.PROVIDER_CHOICES.items():
             console.print(f"{key}. {name}")
         
         # Get provider choice
         while True:
             try:
                 choice = Prompt.ask("\nEnter your choice (1-3)", default="1")
-                if choice in providers:
-                    self.provider = providers[choice][0]
-                    env_var = providers[choice][1]
+                if choice in self.PROVIDER_CHOICES:
+                    self.provider = self.PROVIDER_CHOICES[choice]
                     break
                 console.print("[red]Invalid choice. Please select 1-3.[/]")
-            except:
-                # If prompt fails, use default
+            except EOFError:
+                # If prompt fails (no interactive input), use default
                 self.provider = "OpenAI"
-                env_var = "OPENAI_API_KEY"
                 break
         
         # Get API key
@@ -160,7 +368,7 @@ class TerminalMonitor:
                 if self.api_key.strip():
                     break
                 console.print("[red]API key cannot be empty.[/]")
-            except:
+            except (EOFError, OSError):
                 console.print("[red]Could not get API key interactively. Please set it via environment variable or config file.[/]")
                 sys.exit(1)
         
@@ -168,20 +376,152 @@ class TerminalMonitor:
         self.save_config(self.provider, self.api_key)
         
         # Set environment variable
-        os.environ[env_var] = self.api_key
-        
-        # Initialize provider
-        self.initialize_provider(self.provider, self.api_key)
+        os.environ[self.PROVIDER_ENV_VARS[self.provider]] = self.api_key
+    
+    @functools.cached_property
+    def client(self):
+        """AI client for the selected provider, created on first use."""
+        try:
+            return self.initialize_provider(self.provider, self.api_key)
+        except ImportError as e:
+            raise RuntimeError("Required AI libraries not installed. Please install them with: pip install -r requirements.txt") from e
     
     def initialize_provider(self, provider, api_key):
-        """Initialize the selected AI provider."""
+        """Import the selected provider's SDK and return its client."""
         if provider == "OpenAI":
-            self.client = openai.OpenAI(api_key=api_key)
+            import httpx
+            import openai
+            # One pooled HTTP/2 connection is shared by every request in this run
+            http_client = httpx.AsyncClient(
+                http2=True,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+            )
+            return openai.AsyncOpenAI(api_key=api_key, http_client=http_client, timeout=30.0, max_retries=2)
         elif provider == "Google Gemini":
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
-            self.client = genai
+            return genai
         elif provider == "Groq":
-            self.client = groq.Client(api_key=api_key)
+            import groq
+            return groq.AsyncGroq(api_key=api_key)
+        raise ValueError(f"Unsupported AI provider: {provider}")
+    
+    def response_cache_key(self, error_message, error_text, model):
+        """Build the response cache key for an error."""
+        payload = f"{error_message}\0{error_text}\0{model}"
+        return hashlib.sha256(payload.encode("utf-8", "replace")).hexdigest()
+    
+    def load_cached_response(self, key):
+        """Load a cached AI response, if any."""
+        if not CACHE_ENABLED:
+            return None
+        cache_file = CACHE_DIR / f"{key}.json"
+        try:
+            return json_loads(cache_file.read_bytes())
+        except (OSError, ValueError):
+            return None
+    
+    def save_cached_response(self, key, result):
+        """Save an AI response to the cache, pruning the oldest entries."""
+        if not CACHE_ENABLED:
+            return
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            (CACHE_DIR / f"{key}.json").write_bytes(json_dumps(result))
+            entries = list(CACHE_DIR.glob("*.json"))
+            if len(entries) > CACHE_MAX_ENTRIES:
+                entries.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+                    entry.unlink()
+        except OSError:
+            pass
+    
+    @property
+    def semantic_cache_enabled(self):
+        """Whether embedding-based response lookup is available."""
+        return CACHE_ENABLED and np is not None and self.provider == "OpenAI"
+    
+    def load_semantic_cache(self):
+        """Load stored embeddings and their responses from disk."""
+        self.semantic_vectors = []
+        self.semantic_results = []
+        try:
+            results = json_loads(SEMANTIC_CACHE_PATH.read_bytes())
+            vectors = np.load(SEMANTIC_VECTORS_PATH)
+        except (OSError, ValueError):
+            return
+        if len(results) != len(vectors):
+            # The two files are out of step; start over
+            return
+        self.semantic_vectors = list(vectors)
+        self.semantic_results = results
+    
+    def save_semantic_cache(self):
+        """Persist the most recent semantic cache entries to disk."""
+        # Responses go to JSON; embeddings go to a sidecar .npy as raw float32
+        try:
+            SEMANTIC_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            np.save(SEMANTIC_VECTORS_PATH, np.stack(self.semantic_vectors[-CACHE_MAX_ENTRIES:]))
+            SEMANTIC_CACHE_PATH.write_bytes(json_dumps(self.semantic_results[-CACHE_MAX_ENTRIES:]))
+        except OSError:
+            pass
+    
+    def embedding_text(self, error_message, error_text):
+        """Text embedded for semantic lookup: the message and the output from the error onward."""
+        # Output before the error is build/test preamble that would swamp the embedding,
+        # so skip it and keep the end of the error region if it is still too long
+        match = ERROR_TEXT_RE.search(error_text)
+        error_region = error_text[match.start():] if match else error_text
+        return f"{error_message}\n{error_region[-EMBEDDING_MAX_CHARS:]}"
+    
+    async def embed_error(self, error_message, error_text):
+        """Embed an error for semantic lookup, or return None on failure."""
+        try:
+            response = await self.client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=self.embedding_text(error_message, error_text)
+            )
+        except Exception:
+            return None
+        return np.asarray(response.data[0].embedding, dtype=np.float32)
+    
+    def find_similar_response(self, vector):
+        """Return the cached response most similar to vector, if close enough."""
+        if self.semantic_vectors is None:
+            self.load_semantic_cache()
+        if not self.semantic_vectors:
+            return None
+        matrix = np.stack(self.semantic_vectors)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+        similarities = matrix @ vector / np.where(norms == 0, 1, norms)
+        best = int(np.argmax(similarities))
+        if similarities[best] < SEMANTIC_CACHE_THRESHOLD:
+            return None
+        return self.semantic_results[best]
+    
+    def remember_similar_response(self, vector, result):
+        """Add a response to the semantic cache."""
+        if self.semantic_vectors is None:
+            self.load_semantic_cache()
+        self.semantic_vectors.append(vector)
+        self.semantic_results.append(result)
+        self.save_semantic_cache()
+    
+    async def prewarm_analysis(self):
+        """Create the AI client and load the semantic cache off the event loop."""
+        if self.use_daemon:
+            return
+        
+        def warm():
+            self.client
+            if self.semantic_cache_enabled and self.semantic_vectors is None:
+                self.load_semantic_cache()
+        try:
+            await asyncio.to_thread(warm)
+        except Exception:
+            # Any failure is reported when the analysis itself runs
+            pass
     
     async def analyze_error(self, error_text):
         """Analyze an error and suggest fixes."""
@@ -195,114 +535,178 @@ class TerminalMonitor:
         console.print("[cyan]Analyzing error...[/]")
         
         try:
-            # Prepare the error prompt
             error_message = error_context.get("message", "Unknown error")
-            prompt = f"""
-            You are a programming assistant. Help debug the following error:
-            
-            Error message: {error_message}
-            
-            Full error:
-            {error_text}
-            
-            Please provide:
-            1. A brief explanation of what caused the error
-            2. A solution to fix the error
-            """
+            if self.use_daemon:
+                result = await self.request_daemon_analysis(error_message, error_text)
+                streamed = False
+            else:
+                result, streamed = await self.get_analysis(error_message, error_text, stream=True)
+            self.format_response(result, streamed=streamed)
+        except Exception as e:
+            console.print(Panel(f"[bold red]Error during analysis: {e}[/]"))
+    
+    async def get_analysis(self, error_message, error_text, stream=False):
+        """Return an analysis of an error and whether it was already streamed."""
+        # Prepare the error prompt
+        prompt = PROMPT_TEMPLATE.format_map({"error_message": error_message, "raw_error": error_text})
+        
+        # Reuse the answer for an error we have already analyzed
+        model_name = AI_MODELS[self.provider]
+        cache_key = self.response_cache_key(error_message, error_text, model_name)
+        cached = self.response_memo.get(cache_key) or self.load_cached_response(cache_key)
+        
+        # Otherwise look for an answer to a near-identical error
+        vector = None
+        if cached is None and self.semantic_cache_enabled:
+            vector = await self.embed_error(error_message, error_text)
+            if vector is not None:
+                similar = self.find_similar_response(vector)
+                if similar is not None:
+                    confidence = min(similar.get("confidence", 0.0), SEMANTIC_MATCH_CONFIDENCE)
+                    cached = dict(similar, error=error_message, confidence=confidence)
+        
+        if cached is not None:
+            self.response_memo[cache_key] = cached
+            return cached, False
+        
+        try:
+            # A plain notice rather than console.status, whose spinner thread
+            # cannot yield to other coroutines
+            console.print("[bold green]Consulting AI for solutions...[/]")
+            explanation = await self.request_explanation(prompt, model_name, error_message if stream else None)
+        except Exception as api_error:
+            console.print(f"[yellow]Error with {self.provider} API: {api_error}[/]")
+            console.print("[yellow]Providing local analysis instead...[/]")
             
+            # Provide a basic analysis based on the error type
+            return self.local_analysis(error_message), False
+        
+        result = {
+            "error": error_message,
+            "explanation": explanation,
+            "solution": "See explanation above for the solution.",
+            "confidence": 0.9
+        }
+        
+        self.response_memo[cache_key] = result
+        self.save_cached_response(cache_key, result)
+        if vector is not None:
+            self.remember_similar_response(vector, result)
+        return result, stream and self.provider == "OpenAI"
+    
+    async def request_explanation(self, prompt, model_name, stream_error=None):
+        """Ask the AI provider about an error; OpenAI answers stream when stream_error is set."""
+        messages = [
+            {"role": "system", "content": "You are a helpful AI programming assistant."},
+            {"role": "user", "content": prompt}
+        ]
+        if self.provider == "OpenAI":
+            if stream_error is not None:
+                # Show the OpenAI answer as it arrives
+                stream = await self.client.chat.completions.create(model=model_name, messages=messages, stream=True)
+                return await self.format_response_stream(stream_error, stream)
+            response = await self.client.chat.completions.create(model=model_name, messages=messages)
+            return response.choices[0].message.content
+        elif self.provider == "Google Gemini":
+            # The Gemini SDK has no async API, so keep it off the event loop
+            model = self.client.GenerativeModel(model_name)
+            response = await asyncio.to_thread(model.generate_content, prompt)
+            return response.text
+        elif self.provider == "Groq":
+            response = await self.client.chat.completions.create(model=model_name, messages=messages)
+            return response.choices[0].message.content
+        raise ValueError(f"Unsupported AI provider: {self.provider}")
+    
+    async def request_daemon_analysis(self, error_message, error_text):
+        """Have the running daemon analyze an error."""
+        try:
+            reader, writer = await asyncio.open_connection(DAEMON_HOST, DAEMON_PORT, limit=DAEMON_MESSAGE_LIMIT)
             try:
-                with console.status("[bold green]Consulting AI for solutions...[/]"):
-                    if self.provider == "OpenAI":
-                        response = self.client.chat.completions.create(
-                            model="gpt-3.5-turbo",
-                            messages=[
-                                {"role": "system", "content": "You are a helpful AI programming assistant."},
-                                {"role": "user", "content": prompt}
-                            ]
-                        )
-                        explanation = response.choices[0].message.content
-                    elif self.provider == "Google Gemini":
-                        model = self.client.GenerativeModel('gemini-pro')
-                        response = model.generate_content(prompt)
-                        explanation = response.text
-                    elif self.provider == "Groq":
-                        response = self.client.chat.completions.create(
-                            model="mixtral-8x7b-32768",
-                            messages=[
-                                {"role": "system", "content": "You are a helpful AI programming assistant."},
-                                {"role": "user", "content": prompt}
-                            ]
-                        )
-                        explanation = response.choices[0].message.content
-                
-                # Format and display the response
-                result = {
-                    "error": error_message,
-                    "explanation": explanation,
-                    "solution": "See explanation above for the solution.",
-                    "confidence": 0.9
-                }
-                
-                self.format_response(result)
-            except Exception as api_error:
-                console.print(f"[yellow]Error with {self.provider} API: {api_error}[/]")
-                console.print("[yellow]Providing local analysis instead...[/]")
-                
-                # Provide a basic analysis based on the error type
-                if "TypeError: can only concatenate str (not \"int\") to str" in error_text:
-                    result = {
-                        "error": "TypeError: can only concatenate str (not \"int\") to str",
-                        "explanation": "This error occurs when you try to add (concatenate) a string and an integer directly in Python. Python cannot automatically convert between these types.",
-                        "solution": "Convert the integer to a string using the `str()` function before concatenation. For example: `text + str(num)` instead of `text + num`.",
-                        "confidence": 0.95
-                    }
-                elif "ZeroDivisionError" in error_text:
-                    result = {
-                        "error": "ZeroDivisionError",
-                        "explanation": "This error occurs when you attempt to divide by zero, which is mathematically undefined.",
-                        "solution": "Add a check to ensure the denominator is not zero before performing division. Example: `if b != 0: result = a / b else: handle_zero_case()`",
-                        "confidence": 0.95
-                    }
-                elif "IndexError" in error_text:
-                    result = {
-                        "error": "IndexError",
-                        "explanation": "This error occurs when you try to access an index that is outside the bounds of a list or sequence.",
-                        "solution": "Check that your index is within the valid range (0 to len(sequence)-1) before accessing it. Consider using a try/except block or a conditional check.",
-                        "confidence": 0.95
-                    }
-                elif "KeyError" in error_text:
-                    result = {
-                        "error": "KeyError",
-                        "explanation": "This error occurs when you try to access a dictionary key that doesn't exist.",
-                        "solution": "Use dict.get(key) which returns None for missing keys, or check if the key exists with `if key in dict` before accessing it.",
-                        "confidence": 0.95
-                    }
-                elif "NameError" in error_text:
-                    result = {
-                        "error": "NameError",
-                        "explanation": "This error occurs when you try to use a variable or function that hasn't been defined.",
-                        "solution": "Make sure the variable is defined before using it. Check for typos in variable names. Ensure the variable is defined in the current scope.",
-                        "confidence": 0.95
-                    }
-                elif "TypeError" in error_text and "is not a function" in error_text:
-                    result = {
-                        "error": "TypeError: x is not a function",
-                        "explanation": "This JavaScript error occurs when you try to call something that is not a function as if it were a function.",
-                        "solution": "Check the type of the object before calling it. Make sure you're not using a property when you meant to use a method.",
-                        "confidence": 0.95
-                    }
-                else:
-                    result = {
-                        "error": error_message,
-                        "explanation": "This error typically occurs due to a mismatch between what the code is expecting and what it's actually receiving.",
-                        "solution": "Check the values being used at the point of the error. Ensure types match what the operation requires. Consider adding more validation or error handling.",
-                        "confidence": 0.6
-                    }
+                # The daemon must prove it holds the token before it sees any output
+                client_nonce = secrets.token_hex(16)
+                writer.write(json_dumps({"nonce": client_nonce}) + b"\n")
+                await writer.drain()
+                challenge = json_loads(await reader.readline())
+                expected = daemon_proof(self.daemon_token, "daemon", client_nonce)
+                if not hmac.compare_digest(str(challenge["proof"]), expected):
+                    raise ValueError("daemon failed authentication")
                 
-                self.format_response(result)
-                
-        except Exception as e:
-            console.print(Panel(f"[bold red]Error during analysis: {e}[/]"))
+                writer.write(json_dumps({
+                    "proof": daemon_proof(self.daemon_token, "client", challenge["nonce"]),
+                    "error_message": error_message,
+                    "error_text": error_text
+                }) + b"\n")
+                await writer.drain()
+                result = json_loads(await reader.readline())["result"]
+                if not isinstance(result, dict):
+                    raise ValueError("malformed daemon response")
+                return result
+            finally:
+                writer.close()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            console.print(f"[yellow]TheWatcher daemon unavailable: {e}[/]")
+            console.print("[yellow]Providing local analysis instead...[/]")
+            return self.local_analysis(error_message)
+    
+    async def serve_daemon(self):
+        """Serve analyses to other TheWatcher runs until interrupted."""
+        server = await asyncio.start_server(self.handle_daemon_request, DAEMON_HOST, DAEMON_PORT, limit=DAEMON_MESSAGE_LIMIT)
+        self.daemon_token = secrets.token_hex(32)
+        save_daemon_token(self.daemon_token)
+        console.print(f"[bold green]TheWatcher daemon listening on {DAEMON_HOST}:{DAEMON_PORT}[/]")
+        console.print("[dim]Set THEWATCHER_DAEMON=1 in other terminals to use it.[/]")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if load_daemon_token() == self.daemon_token:
+                DAEMON_TOKEN_PATH.unlink(missing_ok=True)
+    
+    async def handle_daemon_request(self, reader, writer):
+        """Answer one analysis request from a TheWatcher run."""
+        try:
+            line = await reader.readline()
+            if not line:
+                # Availability probe from daemon_available()
+                return
+            hello = json_loads(line)
+            daemon_nonce = secrets.token_hex(16)
+            writer.write(json_dumps({
+                "proof": daemon_proof(self.daemon_token, "daemon", hello["nonce"]),
+                "nonce": daemon_nonce
+            }) + b"\n")
+            await writer.drain()
+            
+            line = await reader.readline()
+            if not line:
+                # The client rejected our proof and hung up
+                return
+            request = json_loads(line)
+            expected = daemon_proof(self.daemon_token, "client", daemon_nonce)
+            if not hmac.compare_digest(str(request["proof"]), expected):
+                console.print("[red]Rejected daemon request that failed authentication[/]")
+                return
+            result, _ = await self.get_analysis(request["error_message"], request["error_text"])
+            writer.write(json_dumps({"result": result}) + b"\n")
+            await writer.drain()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            console.print(f"[red]Invalid daemon request: {e}[/]")
+        finally:
+            writer.close()
+    
+    def local_analysis(self, error_message: str) -> Dict[str, Any]:
+        """Pick a canned analysis for an error message."""
+        match = ERROR_CLASS_RE.match(error_message)
+        error_class = match.group(1) if match else ""
+        
+        response = None
+        if error_class == "TypeError":
+            response = next((tpl for detail, tpl in TYPE_ERROR_FALLBACKS.items() if detail in error_message), None)
+        if response is None:
+            response = FALLBACK_RESPONSES.get(error_class)
+        if response is None:
+            response = dict(DEFAULT_FALLBACK_RESPONSE, error=error_message)
+        return dict(response, source="fallback")
     
     def parse_error(self, error_text: str) -> Dict[str, Any]:
         """Simple error parser."""
@@ -313,15 +717,13 @@ class TerminalMonitor:
         
         # Parse Python errors
         if "Traceback (most recent call last)" in error_text:
-            error_match = re.search(r'([A-Za-z]+Error:.*?)(?:\n|$)', error_text, re.DOTALL)
+            error_match = ERROR_MESSAGE_RE.search(error_text)
             if error_match:
                 error_data["message"] = error_match.group(1).strip()
         
-        # Parse JavaScript errors
-        elif any(marker in error_text for marker in ["Error:", "TypeError:", "SyntaxError:", "ReferenceError:"]):
-            error_match = re.search(r'([A-Za-z]+Error:.*?)(?:\n|$)', error_text, re.DOTALL)
-            if error_match:
-                error_data["message"] = error_match.group(1).strip()
+        # Parse JavaScript errors (every marker such as "TypeError:" contains "Error:")
+        elif "Error:" in error_text:
+            error_data["message"] = find_error_message(error_text)
         
         # Generic fallback
         if not error_data["message"]:
@@ -331,85 +733,161 @@ class TerminalMonitor:
         
         return error_data
     
-    def format_response(self, response: Dict[str, Any]) -> None:
-        """Format and display a response."""
+    async def format_response_stream(self, error: str, chunks) -> str:
+        """Display the error and stream its explanation; return the full text."""
+        console.print(Panel(f"[bold red]{error}[/]", title="Error"))
+        
+        parts = []
+        last_update = 0.0
+        with Live(Panel(Markdown(""), title="Explanation"), console=console, refresh_per_second=12) as live:
+            async for chunk in chunks:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                parts.append(chunk.choices[0].delta.content)
+                # Re-parsing the Markdown is the costly part, so throttle it to the refresh rate
+                now = time.monotonic()
+                if now - last_update >= 1 / 12:
+                    live.update(Panel(Markdown("".join(parts)), title="Explanation"))
+                    last_update = now
+            explanation = "".join(parts)
+            live.update(Panel(render_markdown(explanation), title="Explanation"))
+        return explanation
+    
+    def format_response(self, response: Dict[str, Any], streamed: bool = False) -> None:
+        """Format and display a response, skipping panels already streamed."""
         error = response.get("error", "Unknown error")
         explanation = response.get("explanation", "No explanation available")
         solution = response.get("solution", "No solution available")
         confidence = response.get("confidence", 0.0)
         
-        # Error panel
-        console.print(Panel(f"[bold red]{error}[/]", title="Error"))
+        # Canned fallback text is plain, so skip the Markdown parser for it
+        render = Text if response.get("source") == "fallback" else render_markdown
         
-        # Explanation panel
-        console.print(Panel(Markdown(explanation), title="Explanation"))
+        if not streamed:
+            # Error panel
+            console.print(Panel(f"[bold red]{error}[/]", title="Error"))
+            
+            # Explanation panel
+            console.print(Panel(render(explanation), title="Explanation"))
         
         # Solution panel if different from explanation
         if solution != "See explanation above for the solution.":
-            console.print(Panel(Markdown(solution), title="Solution"))
+            console.print(Panel(render(solution), title="Solution"))
         
         # Confidence
-        confidence_color = "green" if confidence > 0.7 else "yellow" if confidence > 0.4 else "red"
-        console.print(f"[{confidence_color}]Confidence: {confidence:.0%}[/]")
+        confidence_color = CONFIDENCE_COLORS[bisect.bisect_left(CONFIDENCE_THRESHOLDS, confidence)]
+        console.print(f"[{confidence_color}]Confidence: {round(confidence * 100)}%[/]")
     
     def execute_command(self, command):
         """Execute a command and monitor for errors."""
-        # Create temporary file to capture output
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_file:
-            temp_path = temp_file.name
-        
         try:
-            # Run the command and redirect output to file
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
-            
-            # Stream output to console and check for errors
-            output = []
-            for line in process.stdout:
-                sys.stdout.write(line)
-                output.append(line)
-            
-            process.wait()
-            full_output = ''.join(output)
-            
-            # Check for errors in output
-            error_patterns = [
-                r"Traceback \(most recent call last\)",  # Python
-                r"[A-Za-z]+Error:",  # Generic errors
-                r"Exception in thread",  # Java
-                r"Caused by:",  # Java 
-                r"npm ERR!",  # npm
-                r"SyntaxError:",  # JavaScript
-                r"ReferenceError:",  # JavaScript
-                r"TypeError:"  # JavaScript
-            ]
-            
-            if any(re.search(pattern, full_output) for pattern in error_patterns):
-                # Found an error, run analysis
-                asyncio.run(self.analyze_error(full_output))
-            
-            return process.returncode
-            
+            return asyncio.run(self.execute_command_async(command))
         except Exception as e:
             console.print(f"[bold red]Error executing command: {e}[/]")
             return 1
+    
+    async def kill_process_tree(self, process):
+        """Kill a command's shell and everything it started."""
+        if os.name == "nt":
+            # Killing cmd.exe alone would leave the command running and holding the output pipe
+            killer = await asyncio.create_subprocess_exec(
+                "taskkill", "/F", "/T", "/PID", str(process.pid),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await killer.wait()
+        else:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+    
+    async def execute_command_async(self, command):
+        """Run a command, relay its output, and analyze the first error."""
+        # Relay raw bytes straight to the stdout file descriptor; text is only
+        # decoded once an error has been found
+        sys.stdout.flush()
+        stdout_fd = sys.stdout.fileno()
+        
+        # The shell is kept so builtins and .cmd/.bat tools such as npm still work on Windows
+        process = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        
+        # Stream output to console in chunks (no line length limit) and scan it for errors,
+        # keeping only a bounded window of output around the first one
+        output = bytearray()
+        scan_from = 0
+        error_start = None
+        prewarm = None
+        try:
+            while True:
+                chunk = await process.stdout.read(OUTPUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                view = memoryview(chunk)
+                while view:
+                    view = view[os.write(stdout_fd, view):]
+                if error_start is None:
+                    output += chunk
+                    match = ERROR_RE.search(output, scan_from)
+                    if match:
+                        # Start at the matching line, but not far before the match on a very long line
+                        line_start = output.rfind(b"\n", 0, match.start()) + 1
+                        error_start = max(line_start, match.start() - ERROR_SCAN_OVERLAP)
+                        # Get the AI client ready while the rest of the output drains
+                        prewarm = asyncio.create_task(self.prewarm_analysis())
+                        del output[error_start + OUTPUT_BUFFER_LIMIT:]
+                        continue
+                    # Resume at the unfinished last line, so a match split across chunks is found
+                    scan_from = max(output.rfind(b"\n") + 1, len(output) - ERROR_SCAN_OVERLAP)
+                    if len(output) > OUTPUT_BUFFER_LIMIT:
+                        # Drop the oldest output, cutting at a line boundary
+                        cut = len(output) - OUTPUT_BUFFER_LIMIT
+                        newline = output.find(b"\n", cut)
+                        removed = newline + 1 if newline != -1 else cut
+                        del output[:removed]
+                        scan_from = max(scan_from - removed, 0)
+                elif len(output) - error_start < OUTPUT_BUFFER_LIMIT:
+                    output += chunk[:error_start + OUTPUT_BUFFER_LIMIT - len(output)]
+            
+            await process.wait()
         finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+            # Never leave the command running unwaited if relaying fails or is interrupted
+            if process.returncode is None:
+                await self.kill_process_tree(process)
+                await process.wait()
+                if prewarm is not None:
+                    prewarm.cancel()
+        
+        if error_start is not None:
+            # Found an error, run analysis
+            await prewarm
+            encoding = locale.getpreferredencoding(False)
+            await self.analyze_error(output.decode(encoding, "replace"))
+        
+        return process.returncode
 
 def main():
     """Run the terminal monitor."""
     parser = argparse.ArgumentParser(description="TheWatcher - AI-Powered Terminal Error Monitor")
-    parser.add_argument("command", nargs="+", help="Command to monitor")
+    parser.add_argument("command", nargs="*", help="Command to monitor")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and analyze errors for other TheWatcher runs")
     args = parser.parse_args()
     
+    if args.daemon:
+        monitor = TerminalMonitor(connect_to_daemon=False)
+        try:
+            asyncio.run(monitor.serve_daemon())
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    if not args.command:
+        parser.error("the following arguments are required: command")
+    
     monitor = TerminalMonitor()
     
     # Get the command to monitor